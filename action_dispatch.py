@@ -0,0 +1,116 @@
+"""
+Routes recognised gestures to the process that owns the action state.
+
+Cooldowns (action_executor), combo progress and the compiled bindings
+(gesture_combos) live in one process's memory. With a single server process
+that is simply the server. With `python main.py --workers N` the browser's
+frames are spread over all workers, so the launcher runs a dispatcher that
+owns this state, and every worker forwards its gestures to it over a local,
+authenticated connection:
+
+  worker:     classify frame ──→ feed(session, gesture, seq) ──┐
+  launcher:   gesture_combos.feed → run_action (cooldowns)  ←──┘
+
+Binding changes made through any worker are forwarded as rebuild(), so the
+dispatcher always matches against the current gesture_actions.json and
+gesture_combos.json.
+"""
+
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import gesture_combos
+from action_executor import execute_action
+
+ENV_PORT = "GESTURE_DISPATCH_PORT"
+ENV_KEY  = "GESTURE_DISPATCH_KEY"
+HOST = "127.0.0.1"
+
+# Workers are started with the dispatcher's address in their environment
+REMOTE = ENV_PORT in os.environ
+
+_HANDLERS = {
+    "feed":    gesture_combos.feed,
+    "execute": execute_action,
+    "rebuild": gesture_combos.rebuild,
+}
+
+_local = threading.local()   # one connection per thread-pool thread
+
+
+def feed(session, gesture, seq=None):
+    """gesture_combos.feed in the process that owns the action state."""
+    if not REMOTE:
+        return gesture_combos.feed(session, gesture, seq)
+    return _call("feed", session, gesture, seq)
+
+def execute(gesture):
+    """execute_action in the process that owns the action state."""
+    if not REMOTE:
+        return execute_action(gesture)
+    return _call("execute", gesture)
+
+def rebuild():
+    """Recompile bindings. Call after gesture_actions.json or the combos change."""
+    if not REMOTE:
+        return gesture_combos.rebuild()
+    return _call("rebuild")
+
+
+# ─── WORKER SIDE ─────────────────────────────────────────────────────────────
+
+def _call(name, *args, attempts=2):
+    for attempt in range(attempts):
+        conn = getattr(_local, "conn", None)
+        try:
+            if conn is None:
+                conn = _local.conn = Client((HOST, int(os.environ[ENV_PORT])),
+                                            authkey=bytes.fromhex(os.environ[ENV_KEY]))
+            conn.send((name, args))
+            return conn.recv()
+        except (EOFError, OSError) as e:
+            _local.conn = None
+            if attempt == attempts - 1:
+                print(f"ERROR: action dispatcher unreachable ({name}): {e}")
+    return None
+
+
+# ─── DISPATCHER SIDE ─────────────────────────────────────────────────────────
+
+def serve():
+    """
+    Start the dispatcher in this process. Its address is put in the environment,
+    so only workers started after this call forward to it.
+    """
+    key = os.urandom(16)
+    listener = Listener((HOST, 0), authkey=key)
+    os.environ[ENV_PORT] = str(listener.address[1])
+    os.environ[ENV_KEY]  = key.hex()
+    threading.Thread(target=_accept, args=(listener,), daemon=True,
+                     name="action-dispatch").start()
+    print(f"Action dispatcher listening on {HOST}:{listener.address[1]}")
+
+def _accept(listener):
+    while True:
+        try:
+            conn = listener.accept()
+        except (AuthenticationError, OSError) as e:
+            print(f"ERROR: action dispatcher refused a connection: {e}")
+            continue
+        threading.Thread(target=_serve, args=(conn,), daemon=True).start()
+
+def _serve(conn):
+    with conn:
+        while True:
+            try:
+                name, args = conn.recv()
+            except (EOFError, OSError):
+                return   # worker exited
+            try:
+                result = _HANDLERS[name](*args)
+            except Exception as e:
+                print(f"ERROR in action dispatcher {name}: {e}")
+                result = None
+            conn.send(result)
@@ -1,6 +1,7 @@
 import ctypes
 ctypes.windll.user32.SetProcessDPIAware()
 from datetime import datetime
+import threading
 import time
 import pyautogui
 import subprocess
@@ -59,6 +60,7 @@ ACTION_COOLDOWNS = {
 
 # Tracks last execution time per action
 _last_executed: dict[str, float] = {}
+_cooldown_lock = threading.Lock()
 
 ACTION_FILE = "gesture_actions.json"
 
@@ -103,20 +105,25 @@ def remove_action(gesture):
     return False
 
 def execute_action(gesture):
+    """Run the action bound to `gesture`. Returns the action name, or None if nothing fired."""
     actions = load_actions()
     if gesture not in actions:
         print(f"No action assigned to {gesture}")
-        return
-    action = actions[gesture]
+        return None
+    return run_action(actions[gesture])
 
+def run_action(action):
+    """Run `action` by name, subject to its cooldown. Returns the action name, or None if nothing fired."""
     # Enforce per-action cooldown
     cooldown = ACTION_COOLDOWNS.get(action, 0)
     if cooldown > 0:
-        now  = time.time()
-        last = _last_executed.get(action, 0)
-        if now - last < cooldown:
-            return   # still in cooldown, silently skip
-        _last_executed[action] = now
+        # Frames are handled concurrently, so check and claim the slot in one step
+        with _cooldown_lock:
+            now  = time.time()
+            last = _last_executed.get(action, 0)
+            if now - last < cooldown:
+                return None   # still in cooldown, silently skip
+            _last_executed[action] = now
 
     print(f"Executing action: {action}")
 
@@ -254,6 +261,9 @@ def execute_action(gesture):
 
     else:
         print(f"Unknown action: {action}")
+        return None
+
+    return action
 
 if __name__ == "__main__":
     initialize_actions()
@@ -0,0 +1,300 @@
+"""
+Server-side capture pipeline for kiosk / headless stations without a browser.
+
+Three threads connected by bounded latest-frame-wins queues:
+
+  capture     cv2.VideoCapture (camera index or video file)
+      │
+  landmarks   MediaPipe Hands → 21 landmarks (or nothing if no hand)
+      │
+  classify    callback, e.g. main.classify_and_act (KNN + combos + action)
+
+When a stage is slower than the one feeding it, the unread item in its input
+queue is overwritten by the newer one. Slow stages therefore drop frames
+instead of building up a backlog, so end-to-end latency stays at one frame
+per stage.
+
+Each stage reports fps, its own processing time, the latency since capture
+and how many of its input frames were dropped. See stats().
+
+Started by /start when a capture source is configured (see main.py), or from
+the command line to test against a recorded video:
+  python capture_pipeline.py recording.mp4
+"""
+
+import collections
+import os
+import threading
+import time
+
+CAPTURE_SOURCE_ENV = "GESTURE_CAPTURE_SOURCE"
+
+QUEUE_SIZE   = 1      # frames a queue holds before the oldest is dropped
+STATS_ALPHA  = 0.1    # smoothing for the moving averages in stats()
+GET_TIMEOUT  = 0.2    # seconds a stage waits for input before re-checking stop
+
+MIN_DETECTION_CONFIDENCE = 0.75
+MIN_TRACKING_CONFIDENCE  = 0.75
+
+
+def configured_source():
+    """Capture source from the environment, or None for browser-side detection."""
+    return os.environ.get(CAPTURE_SOURCE_ENV) or None
+
+def parse_source(source):
+    """Camera indices arrive as strings from the query string / environment."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class LatestFrameQueue:
+    """Bounded queue where put() never blocks: the oldest unread item is dropped."""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self._items  = collections.deque(maxlen=maxsize)
+        self._cond   = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=GET_TIMEOUT):
+        """Oldest unread item, or None on timeout / once closed and empty."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed and not self._items
+
+
+class StageStats:
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self.frames     = 0
+        self.interval   = None   # moving average seconds between outputs
+        self.busy       = None   # moving average processing seconds per frame
+        self.latency    = None   # moving average seconds since capture
+        self._last_done = None
+
+    def record(self, busy, captured_at):
+        now = time.perf_counter()
+        with self.lock:
+            self.frames += 1
+            if self._last_done is not None:
+                self.interval = _ewma(self.interval, now - self._last_done)
+            self._last_done = now
+            self.busy    = _ewma(self.busy, busy)
+            self.latency = _ewma(self.latency, now - captured_at)
+
+    def snapshot(self, dropped):
+        with self.lock:
+            return {
+                "frames":     self.frames,
+                "fps":        round(1 / self.interval, 1) if self.interval else 0.0,
+                "busy_ms":    round(self.busy * 1000, 2) if self.busy is not None else None,
+                "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+                "dropped":    dropped,
+            }
+
+def _ewma(average, value):
+    return value if average is None else average + STATS_ALPHA * (value - average)
+
+
+class CapturePipeline:
+    """
+    source:       camera index or path to a video file
+    on_landmarks: called from the classify thread with a list of 21 {x, y, z}
+                  dicts; its return value is kept as `last_result`
+    realtime:     pace video files at their native fps (cameras pace themselves)
+    """
+
+    def __init__(self, source, on_landmarks, realtime=True):
+        self.source       = parse_source(source)
+        self.on_landmarks = on_landmarks
+        self.realtime     = realtime
+        self.error        = None
+        self.last_result  = None
+        self.hands_seen   = 0
+        self.started      = None
+        self._stop_event  = threading.Event()
+        self._frames      = LatestFrameQueue()
+        self._landmarks   = LatestFrameQueue()
+        self._stats = {name: StageStats() for name in ("capture", "landmarks", "classify")}
+        self._threads = [
+            threading.Thread(target=self._run_stage, args=(name, target), daemon=True,
+                             name=f"capture-{name}")
+            for name, target in (("capture", self._capture),
+                                 ("landmarks", self._detect_landmarks),
+                                 ("classify", self._classify))
+        ]
+
+    def start(self):
+        self.started = time.time()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._frames.close()
+        self._landmarks.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def wait(self):
+        """Block until the source is exhausted (video files) or stop() is called."""
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        return {
+            "source":  str(self.source),
+            "running": self.is_alive(),
+            "uptime":  round(time.time() - self.started, 1) if self.started else 0.0,
+            "error":   self.error,
+            "hands_seen": self.hands_seen,
+            "stages": {
+                "capture":   self._stats["capture"].snapshot(0),
+                "landmarks": self._stats["landmarks"].snapshot(self._frames.dropped),
+                "classify":  self._stats["classify"].snapshot(self._landmarks.dropped),
+            },
+            "last_result": self.last_result,
+        }
+
+    # ─── STAGES ──────────────────────────────────────────────────────────────
+
+    def _run_stage(self, name, target):
+        try:
+            target(self._stats[name])
+        except Exception as e:
+            self.error = f"{name}: {e}"
+            print(f"ERROR in capture {name} stage: {e}")
+            self._stop_event.set()
+        finally:
+            # Let the downstream stage drain and exit
+            if name == "capture":
+                self._frames.close()
+            elif name == "landmarks":
+                self._landmarks.close()
+
+    def _capture(self, stats):
+        import cv2
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise RuntimeError(f"cannot open capture source {self.source!r}")
+        is_file = isinstance(self.source, str)
+        fps = cap.get(cv2.CAP_PROP_FPS) if is_file else 0
+        frame_period = 1.0 / fps if self.realtime and fps and fps > 0 else 0
+        print(f"Capturing from {self.source!r}")
+        try:
+            next_frame = time.perf_counter()
+            while not self._stop_event.is_set():
+                t0 = time.perf_counter()
+                ok, frame = cap.read()
+                if not ok:
+                    if is_file:
+                        print("Capture source ended")
+                        return
+                    raise RuntimeError("camera read failed")
+                stats.record(time.perf_counter() - t0, t0)
+                self._frames.put((frame, t0))
+                if frame_period:
+                    next_frame += frame_period
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame = time.perf_counter()
+        finally:
+            cap.release()
+
+    def _detect_landmarks(self, stats):
+        import cv2
+        import mediapipe as mp
+        hands = mp.solutions.hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+            min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
+        )
+        try:
+            while not self._stop_event.is_set() and not self._frames.closed:
+                item = self._frames.get()
+                if item is None:
+                    continue
+                frame, captured_at = item
+                t0 = time.perf_counter()
+                results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                stats.record(time.perf_counter() - t0, captured_at)
+                # Same as the browser: frames without a hand are not classified
+                if results.multi_hand_landmarks:
+                    landmarks = [{"x": lm.x, "y": lm.y, "z": lm.z}
+                                 for lm in results.multi_hand_landmarks[0].landmark]
+                    self._landmarks.put((landmarks, captured_at))
+        finally:
+            hands.close()
+
+    def _classify(self, stats):
+        while not self._stop_event.is_set() and not self._landmarks.closed:
+            item = self._landmarks.get()
+            if item is None:
+                continue
+            landmarks, captured_at = item
+            t0 = time.perf_counter()
+            self.last_result = self.on_landmarks(landmarks)
+            self.hands_seen += 1
+            stats.record(time.perf_counter() - t0, captured_at)
+
+
+def main():
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Run the capture pipeline without the server "
+                                                 "(classifies only, no actions are executed)")
+    parser.add_argument("source", help="camera index or video file")
+    parser.add_argument("--fast", action="store_true",
+                        help="read video files as fast as possible instead of at native fps")
+    args = parser.parse_args()
+
+    from gesture_detector import predict_from_landmarks
+
+    def classify(landmarks):
+        gesture, confidence = predict_from_landmarks(landmarks)
+        return {"gesture": gesture, "confidence": float(confidence)}
+
+    pipeline = CapturePipeline(args.source, classify, realtime=not args.fast)
+    pipeline.start()
+    try:
+        while pipeline.is_alive():
+            time.sleep(1)
+            stages = pipeline.stats()["stages"]
+            print("  ".join(f"{name}: {s['fps']} fps {s['latency_ms']} ms"
+                            for name, s in stages.items()),
+                  pipeline.last_result)
+    except KeyboardInterrupt:
+        pass
+    pipeline.stop()
+    print(json.dumps(pipeline.stats(), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Training dataset files shared by the server, the recorder export and the
+collector script:
+
+  datasets/gesture_landmarks.csv   one row per sample: label + 21 x (x, y, z)
+  datasets/gesture_config.json     {"gestures": [...]} known gesture names
+
+A CSV written somewhere else keeps its own gesture_config.json next to it.
+"""
+
+import csv
+import json
+import os
+
+DATASET_DIR = "datasets"
+CONFIG_NAME = "gesture_config.json"
+CSV_FILE = os.path.join(DATASET_DIR, "gesture_landmarks.csv")
+CONFIG_FILE = os.path.join(DATASET_DIR, CONFIG_NAME)
+
+CSV_HEADER = ["label"] + [f"{coord}{i}" for i in range(21) for coord in ["x","y","z"]]
+
+
+def config_file_for(csv_file):
+    """The gesture list belonging to `csv_file`."""
+    return os.path.join(os.path.dirname(csv_file), CONFIG_NAME)
+
+def _ensure_dir(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+def ensure_csv(csv_file=CSV_FILE):
+    """Create `csv_file` with its header row if it does not exist yet."""
+    _ensure_dir(csv_file)
+    if not os.path.exists(csv_file):
+        with open(csv_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+
+def update_config(gesture, config_file=CONFIG_FILE):
+    """Add `gesture` to the gesture list if it is not there yet."""
+    _ensure_dir(config_file)
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, "r") as f:
+                config = json.load(f)
+        except json.JSONDecodeError:
+            config = {"gestures": []}
+    else:
+        config = {"gestures": []}
+    if gesture not in config["gestures"]:
+        config["gestures"].append(gesture)
+    with open(config_file, "w") as f:
+        json.dump(config, f, indent=4)
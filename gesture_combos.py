@@ -0,0 +1,269 @@
+"""
+Gesture sequence combos, e.g.  fist → palm  =  close_window.
+
+Combos live in gesture_combos.json as a list of
+  {"sequence": ["fist", "palm"], "action": "close_window", "timeout": 0.8}
+where `timeout` is the maximum gap in seconds between releasing one gesture
+and showing the next.
+
+Combos and the single-gesture bindings from gesture_actions.json are compiled
+into one trie. Each session keeps a pointer into the trie and advances it only
+when the classifier output changes, so the per-frame work is a dict lookup.
+A gesture counts as released on a frame without a confident gesture (fed as
+None) or when it has not been seen for RELEASE_GAP seconds, so showing it
+again starts a new press rather than continuing the old one.
+
+Prefix ambiguity: if a single-gesture binding is also the start of a combo
+(e.g. "fist" is bound and "fist → palm" exists), the single action is held
+back for HOLD_OFF seconds. If the combo continues in that window the combo
+fires instead; otherwise the single action fires and keeps repeating while
+the gesture is held, exactly like a plain binding.
+
+With no combos configured, feed() falls straight through to execute_action.
+"""
+
+import json
+import os
+import threading
+import time
+
+from action_executor import execute_action, load_actions, run_action
+
+COMBO_FILE = "gesture_combos.json"
+
+DEFAULT_TIMEOUT = 0.8   # seconds allowed between gestures of a combo
+HOLD_OFF        = 0.35  # delay for single bindings that also start a combo
+RELEASE_GAP     = 0.35  # seconds without frames after which a held gesture is released
+SESSION_IDLE    = 300   # seconds after which an unseen session's state is dropped
+EVICT_INTERVAL  = 30    # minimum seconds between scans for idle sessions
+
+
+class _Node:
+    __slots__ = ("gesture", "children", "action", "timeout", "depth")
+
+    def __init__(self, gesture=None, depth=0):
+        self.gesture  = gesture
+        self.children = {}
+        self.action   = None
+        self.timeout  = 0.0
+        self.depth    = depth
+
+
+class _SessionState:
+    def __init__(self, root):
+        self.lock           = threading.Lock()
+        self.root           = root
+        self.node           = root
+        self.last_gesture   = None
+        self.last_time      = time.monotonic()
+        self.last_seq       = None   # highest frame sequence number seen
+        self.holding_action = None   # single action that repeats while its gesture is held
+        self.pending        = None   # hold-off timer for an ambiguous single binding
+
+
+_root        = None
+_has_combos  = False
+_sessions    = {}
+_next_evict  = 0.0
+_build_lock  = threading.Lock()
+
+
+# ─── STORAGE ─────────────────────────────────────────────────────────────────
+
+def load_combos():
+    if not os.path.exists(COMBO_FILE):
+        return []
+    with open(COMBO_FILE, "r") as f:
+        return json.load(f)
+
+def _save_combos(combos):
+    with open(COMBO_FILE, "w") as f:
+        json.dump(combos, f, indent=4)
+
+def validate_sequence(sequence):
+    if not isinstance(sequence, list) or len(sequence) < 2:
+        raise ValueError("A combo needs a sequence of at least two gestures")
+    for gesture in sequence:
+        if not isinstance(gesture, str) or not gesture:
+            raise ValueError(f"Combo gestures must be non-empty strings (got {gesture!r})")
+    for prev, gesture in zip(sequence, sequence[1:]):
+        if prev == gesture:
+            raise ValueError(f"Consecutive gestures in a combo must differ ('{gesture}' repeats)")
+
+def update_combo(sequence, action, timeout=DEFAULT_TIMEOUT):
+    validate_sequence(sequence)
+    if not isinstance(action, str) or not action:
+        raise ValueError("A combo needs an action name")
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid combo timeout {timeout!r}")
+    if timeout <= 0:
+        raise ValueError("Combo timeout must be positive")
+    combos = [c for c in load_combos() if c["sequence"] != sequence]
+    combos.append({"sequence": sequence, "action": action, "timeout": timeout})
+    # Compile first so a bad entry never reaches the file that every rebuild reads
+    compile_bindings(load_actions(), combos)
+    _save_combos(combos)
+
+def remove_combo(sequence):
+    combos = load_combos()
+    remaining = [c for c in combos if c["sequence"] != sequence]
+    if len(remaining) == len(combos):
+        return False
+    _save_combos(remaining)
+    return True
+
+
+# ─── COMPILATION ─────────────────────────────────────────────────────────────
+
+def compile_bindings(actions, combos):
+    """Build the trie from single-gesture `actions` and multi-gesture `combos`."""
+    root = _Node()
+    for gesture, action in actions.items():
+        node = root.children.setdefault(gesture, _Node(gesture, 1))
+        node.action = action
+    for combo in combos:
+        node    = root
+        timeout = float(combo.get("timeout", DEFAULT_TIMEOUT))
+        for gesture in combo["sequence"]:
+            node = node.children.setdefault(gesture, _Node(gesture, node.depth + 1))
+            # Shared prefixes keep the most generous timeout of the combos using them
+            node.timeout = max(node.timeout, timeout)
+        node.action = combo["action"]
+    return root
+
+def rebuild():
+    """
+    Recompile bindings. Call after gesture_actions.json or the combos change —
+    through action_dispatch.rebuild() in the server, so it reaches the process
+    that runs the actions.
+    """
+    global _root, _has_combos
+    with _build_lock:
+        combos      = load_combos()
+        _root       = compile_bindings(load_actions(), combos)
+        _has_combos = bool(combos)
+        # Sessions restart from the new root on their next gesture
+        for state in list(_sessions.values()):
+            with state.lock:
+                _cancel_pending(state)
+                state.root = _root
+                state.node = _root
+                state.holding_action = None
+
+
+# ─── MATCHING ────────────────────────────────────────────────────────────────
+
+def feed(session, gesture, seq=None):
+    """
+    Advance `session` with one frame's gesture: a confident classifier output,
+    or None for a frame without a hand or below the confidence threshold.
+    `seq` is the client's frame counter. Frames are classified concurrently and
+    can finish out of order; one older than a frame already fed is ignored.
+    Returns the action that fired on this frame, or None.
+    """
+    if _root is None:
+        rebuild()
+    if not _has_combos:
+        return execute_action(gesture) if gesture is not None else None
+
+    state = _sessions.get(session)
+    if state is None:
+        if gesture is None:
+            return None
+        _evict_idle()
+        state = _sessions.setdefault(session, _SessionState(_root))
+
+    with state.lock:
+        if seq is not None:
+            if state.last_seq is not None and seq <= state.last_seq:
+                return None   # overtaken by a newer frame of this session
+            state.last_seq = seq
+        now = time.monotonic()
+        if gesture is None:
+            # Released. The trie position stays, so a combo can still continue
+            # with its next gesture within the node's timeout.
+            state.last_gesture   = None
+            state.holding_action = None
+            return None
+        if gesture == state.last_gesture and now - state.last_time <= RELEASE_GAP:
+            state.last_time = now
+            if state.holding_action is not None:
+                return run_action(state.holding_action)
+            return None
+
+        # A new gesture, or the same one shown again after a release —
+        # this is the only place the automaton moves
+        gap = now - state.last_time
+        state.last_gesture   = gesture
+        state.last_time      = now
+        state.holding_action = None
+
+        child = state.node.children.get(gesture) if state.node is not state.root else None
+        if child is not None and gap > child.timeout:
+            child = None
+        if child is not None:
+            _cancel_pending(state)
+        else:
+            # Sequence broken: an ambiguous single binding was meant on its own
+            _fire_pending_now(state)
+            child = state.root.children.get(gesture)
+
+        if child is None:
+            state.node = state.root
+            return None
+        if child.children:
+            state.node = child
+            if child.action is not None:
+                _schedule_pending(state, child)
+            return None
+
+        state.node = state.root
+        if child.depth == 1:
+            state.holding_action = child.action
+        return run_action(child.action)
+
+def _evict_idle():
+    """Drop sessions not seen for SESSION_IDLE seconds, e.g. closed or reloaded tabs."""
+    global _next_evict
+    now = time.monotonic()
+    if now < _next_evict:
+        return
+    _next_evict = now + EVICT_INTERVAL
+    for session, state in list(_sessions.items()):
+        with state.lock:
+            if now - state.last_time < SESSION_IDLE:
+                continue
+            _cancel_pending(state)
+            _sessions.pop(session, None)
+
+def _schedule_pending(state, node):
+    timer = threading.Timer(HOLD_OFF, _on_hold_off, (state, node))
+    timer.daemon = True
+    state.pending = (timer, node)
+    timer.start()
+
+def _cancel_pending(state):
+    if state.pending is not None:
+        state.pending[0].cancel()
+        state.pending = None
+
+def _fire_pending_now(state):
+    if state.pending is not None:
+        timer, node = state.pending
+        timer.cancel()
+        state.pending = None
+        run_action(node.action)
+
+def _on_hold_off(state, node):
+    with state.lock:
+        if state.pending is None or state.pending[1] is not node:
+            return
+        state.pending = None
+        state.node = state.root
+        # Still holding a single gesture → behave like a plain binding from now on.
+        # Combos (depth > 1) fire once, like the leaf path in feed().
+        if node.depth == 1 and state.last_gesture == node.gesture:
+            state.holding_action = node.action
+    run_action(node.action)
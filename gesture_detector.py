@@ -3,6 +3,7 @@ import json
 import numpy as np
 import os
 from landmark_utils import normalize_landmarks
+import shared_model
 
 MODELS_DIR = "models"
 
@@ -12,38 +13,85 @@ CLASS_FILE  = os.path.join(MODELS_DIR, "class_names_knn.json")
 
 CONFIDENCE_THRESHOLD = 60
 
-knn         = None
-scaler      = None
-class_names = []
+# Set by `python main.py --workers N`: workers map one shared model file
+# instead of each unpickling their own copy
+SHARED_MODEL = shared_model.enabled()
+
+knn           = None
+scaler        = None
+class_names   = []
+model_version = None
+feature_dtype = np.float64
 
 def reload_model():
-    global knn, scaler, class_names
+    global knn, scaler, class_names, model_version, feature_dtype
     print("Loading gesture detection model...")
-    if os.path.exists(MODEL_FILE):
-        knn         = pickle.load(open(MODEL_FILE, "rb"))
-        scaler      = pickle.load(open(SCALER_FILE, "rb"))
-        class_names = json.load(open(CLASS_FILE, "r"))
+    if SHARED_MODEL:
+        reload_shared_model()
+    elif os.path.exists(MODEL_FILE):
+        knn           = pickle.load(open(MODEL_FILE, "rb"))
+        scaler        = pickle.load(open(SCALER_FILE, "rb"))
+        class_names   = json.load(open(CLASS_FILE, "r"))
+        # Model file mtime doubles as a version tag (changes on every retrain)
+        model_version = model_file_version()
+        # Streaming retrains store float32 training data; queries must match it
+        # or sklearn upcasts the whole training set on every prediction
+        feature_dtype = knn._fit_X.dtype
         print("Model loaded successfully.")
         print("Classes:", class_names)
     else:
         print("ERROR: Model not found. Run retrain.py first.")
 
+def model_file_version():
+    # Nanosecond mtime: retrains of small datasets finish well within a second
+    return os.stat(MODEL_FILE).st_mtime_ns
+
+def reload_shared_model():
+    global class_names, model_version
+    if os.path.exists(MODEL_FILE):
+        version = model_file_version()
+        if shared_model.published_version() != str(version):
+            # Only the worker that retrained pays for unpickling; the rest just remap
+            shared_model.publish(pickle.load(open(MODEL_FILE, "rb")),
+                                 pickle.load(open(SCALER_FILE, "rb")),
+                                 json.load(open(CLASS_FILE, "r")), version)
+    model = shared_model.attach()
+    if model is None:
+        print("ERROR: Model not found. Run retrain.py first.")
+        return
+    class_names   = model.class_names
+    model_version = model.version
+    print("Shared model mapped successfully.")
+    print("Classes:", class_names)
+
+def current_model_version():
+    if SHARED_MODEL:
+        model = shared_model.current()
+        return model.version if model is not None else None
+    return model_version
+
 reload_model()
 
 def predict_from_landmarks(landmarks):
     """
     Accept landmarks directly from the browser (MediaPipe JS output).
     landmarks: list of 21 dicts with keys x, y, z
+               OR numpy array of shape (21, 3) (e.g. replayed recordings)
     Returns: (gesture_name, confidence) or (None, 0)
     """
     global knn, scaler, class_names
+    if SHARED_MODEL:
+        model = shared_model.current()
+        if model is None or landmarks is None or len(landmarks) != 21:
+            return None, 0
+        return model.predict(normalize_landmarks(landmarks))
     if knn is None or scaler is None:
         return None, 0
-    if not landmarks or len(landmarks) != 21:
+    if landmarks is None or len(landmarks) != 21:
         return None, 0
 
     features = normalize_landmarks(landmarks).reshape(1, -1)
-    features = scaler.transform(features)
+    features = scaler.transform(features).astype(feature_dtype, copy=False)
     prediction  = knn.predict(features)[0]
     probs       = knn.predict_proba(features)[0]
     confidence  = np.max(probs) * 100
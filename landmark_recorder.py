@@ -0,0 +1,407 @@
+"""
+Append-only binary recording of live landmark streams, with replay and export.
+
+Every /predict frame can be recorded together with its session id, timestamp,
+predicted gesture, confidence and the action that fired (if any). The request
+handler only enqueues a tuple; a background writer thread packs the records,
+appends them to the current log file and rotates to a new file once it grows
+past `max_bytes`.
+
+Log file layout (little-endian):
+
+  file header   MAGIC (4 bytes) + format version (u8)
+  record        RECORD_HEADER: timestamp (f64), confidence (f32),
+                session / gesture / action byte lengths (u8 each), flags (u8)
+                followed by the session, gesture and action utf-8 strings and,
+                if FLAG_LANDMARKS is set, 21 x 3 raw float32 landmark coords
+
+A record cut short by a crash is ignored by the reader, so a log is always
+readable up to its last complete record. After a failed write the recorder
+carries on in a new file, so a partial record can only ever be a file's tail.
+
+Command line:
+  python landmark_recorder.py replay recordings/*.glog --speed 4
+  python landmark_recorder.py export recordings/*.glog --session abc --label fist
+"""
+
+import argparse
+import csv
+import glob
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from dataset_utils import CSV_FILE, config_file_for, ensure_csv, update_config
+
+RECORDINGS_DIR = "recordings"
+
+MAGIC = b"GLRC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")
+RECORD_HEADER = struct.Struct("<dfBBBB")
+FLAG_LANDMARKS = 0x01
+LANDMARK_BYTES = 21 * 3 * 4
+
+MAX_BYTES  = 64 * 1024 * 1024   # rotate the log once it passes this size
+QUEUE_SIZE = 4096               # frames buffered before the hot path starts dropping
+STOP_TIMEOUT = 5.0              # seconds stop() waits for the writer to flush
+
+# Checked on the hot path — the recorder is only touched while recording
+active = False
+
+_recorder = None
+
+
+class Recorder:
+    def __init__(self, directory=RECORDINGS_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.queue     = queue.Queue(maxsize=QUEUE_SIZE)
+        self.recorded  = 0
+        self.dropped   = 0
+        self.errors    = 0
+        self.last_error = None
+        self.files     = []
+        self._file     = None
+        self._size     = 0
+        self._thread   = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self._thread.start()
+
+    def enqueue(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        # Never block forever: if the writer died the queue may be full
+        try:
+            self.queue.put(None, timeout=STOP_TIMEOUT if self._thread.is_alive() else 0)
+        except queue.Full:
+            pass
+        if self._thread.ident is not None:
+            self._thread.join(timeout=STOP_TIMEOUT)
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                batch = []
+                # Drain whatever else is waiting so each batch is a single write
+                while item is not None:
+                    try:
+                        batch.append(pack_record(*item))
+                    except Exception as e:
+                        self._error(f"skipping unpackable frame: {e}")
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    try:
+                        self._write(b"".join(batch))
+                        self.recorded += len(batch)
+                    except OSError as e:
+                        # e.g. disk full — lose this batch, keep recording. Part of it
+                        # may have reached the file, so start a new one: the partial
+                        # record becomes that file's truncated tail, which readers skip.
+                        self.dropped += len(batch)
+                        self._error(f"write failed: {e}")
+                        self._close()
+                if item is None:
+                    break
+        finally:
+            self._close()
+
+    def _error(self, message):
+        self.errors += 1
+        self.last_error = message
+        print(f"ERROR: landmark recorder {message}")
+
+    def _write(self, data):
+        if self._file is None or self._size >= self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _close(self):
+        if self._file is None:
+            return
+        file = self._file
+        self._file = None
+        try:
+            file.close()
+        except OSError as e:
+            # Flushing the rest of a failed write can fail again
+            self._error(f"closing {file.name} failed: {e}")
+
+    def _rotate(self):
+        self._close()
+        # pid + microseconds keep restarts and --workers processes on separate files;
+        # "xb" refuses to append a second header to an existing log
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path  = os.path.join(self.directory,
+                             f"landmarks_{stamp}_{os.getpid()}_{len(self.files):04d}.glog")
+        self._file = open(path, "xb")
+        self._size = FILE_HEADER.size
+        self.files.append(path)
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        print(f"Recording landmarks to {path}")
+
+
+def pack_record(timestamp, session, landmarks, gesture, confidence, action):
+    session = (session or "").encode("utf-8")[:255]
+    gesture = (gesture or "").encode("utf-8")[:255]
+    action  = (action or "").encode("utf-8")[:255]
+    coords  = b""
+    flags   = 0
+    if landmarks is not None and len(landmarks) == 21:
+        if isinstance(landmarks, np.ndarray):
+            array = landmarks.reshape(21, 3)
+        else:
+            array = [[lm["x"], lm["y"], lm["z"]] for lm in landmarks]
+        coords = np.asarray(array, dtype="<f4").tobytes()
+        flags |= FLAG_LANDMARKS
+    header = RECORD_HEADER.pack(timestamp, confidence or 0.0,
+                                len(session), len(gesture), len(action), flags)
+    return header + session + gesture + action + coords
+
+
+def start_recording(directory=RECORDINGS_DIR, max_bytes=MAX_BYTES):
+    global active, _recorder
+    if _recorder is not None:
+        raise RuntimeError("Recorder is already running")
+    _recorder = Recorder(directory, max_bytes)
+    _recorder.start()
+    active = True
+
+
+def stop_recording():
+    """Flush and close the current log. Returns its status, or None if idle."""
+    global active, _recorder
+    if _recorder is None:
+        return None
+    active = False
+    recorder  = _recorder
+    _recorder = None
+    recorder.stop()
+    return _status(recorder)
+
+
+def record(session, landmarks, gesture, confidence, action):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.enqueue((time.time(), session, landmarks, gesture, confidence, action))
+
+
+def status():
+    if _recorder is None:
+        return {"recording": False}
+    return _status(_recorder)
+
+
+def _status(recorder):
+    return {
+        "recording": recorder is _recorder,
+        "recorded":  recorder.recorded,
+        "dropped":   recorder.dropped,
+        "errors":    recorder.errors,
+        "last_error": recorder.last_error,
+        "pending":   recorder.queue.qsize(),
+        "files":     list(recorder.files),
+    }
+
+
+# ─── READING ─────────────────────────────────────────────────────────────────
+
+def read_records(path):
+    """
+    Yield one dict per complete record in a log file:
+      timestamp, session, gesture, confidence, action, landmarks
+    landmarks is a (21, 3) float32 array, or None for frames without a hand.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        return
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a landmark recording")
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, confidence, session_len, gesture_len, action_len, flags = \
+            RECORD_HEADER.unpack_from(data, offset)
+        body_len = session_len + gesture_len + action_len
+        if flags & FLAG_LANDMARKS:
+            body_len += LANDMARK_BYTES
+        start = offset + RECORD_HEADER.size
+        if start + body_len > len(data):
+            break   # truncated tail
+        end = start + session_len
+        session = data[start:end].decode("utf-8", "replace")
+        gesture = data[end:end + gesture_len].decode("utf-8", "replace")
+        end += gesture_len
+        action = data[end:end + action_len].decode("utf-8", "replace")
+        end += action_len
+        landmarks = None
+        if flags & FLAG_LANDMARKS:
+            landmarks = np.frombuffer(data, dtype="<f4", count=63, offset=end).reshape(21, 3)
+        yield {
+            "timestamp":  timestamp,
+            "session":    session,
+            "gesture":    gesture or None,
+            "confidence": confidence,
+            "action":     action or None,
+            "landmarks":  landmarks,
+        }
+        offset = start + body_len
+
+
+def read_logs(paths):
+    for path in sorted(paths):
+        yield from read_records(path)
+
+
+def select_records(paths, session=None, start=None, end=None, gesture=None, min_confidence=None):
+    """Filter records by session id, time range (unix seconds), gesture and confidence."""
+    for rec in read_logs(paths):
+        if session is not None and rec["session"] != session:
+            continue
+        if start is not None and rec["timestamp"] < start:
+            continue
+        if end is not None and rec["timestamp"] > end:
+            continue
+        if gesture is not None and rec["gesture"] != gesture:
+            continue
+        if min_confidence is not None and rec["confidence"] < min_confidence:
+            continue
+        yield rec
+
+
+# ─── REPLAY / EXPORT ─────────────────────────────────────────────────────────
+
+def replay(paths, speed=1.0, session=None):
+    """
+    Feed recorded frames back through predict_from_landmarks.
+    speed: 1.0 = original timing, 4.0 = four times faster, 0 = as fast as possible.
+    Returns a summary with the number of frames whose prediction changed.
+    """
+    from gesture_detector import predict_from_landmarks
+
+    frames = 0
+    changed = 0
+    latencies = []
+    first_ts = None
+    replay_start = time.perf_counter()
+    for rec in select_records(paths, session=session):
+        if rec["landmarks"] is None:
+            continue
+        if speed > 0:
+            if first_ts is None:
+                first_ts = rec["timestamp"]
+            delay = (rec["timestamp"] - first_ts) / speed - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        gesture, confidence = predict_from_landmarks(rec["landmarks"])
+        latencies.append(time.perf_counter() - t0)
+        frames += 1
+        if gesture != rec["gesture"]:
+            changed += 1
+            print(f"{rec['timestamp']:.3f} [{rec['session']}] "
+                  f"recorded {rec['gesture']} ({rec['confidence']:.1f}%) "
+                  f"-> now {gesture} ({confidence:.1f}%)")
+
+    summary = {"frames": frames, "changed": changed,
+               "elapsed": round(time.perf_counter() - replay_start, 3)}
+    if latencies:
+        latencies.sort()
+        summary["latency_ms_p50"] = round(latencies[len(latencies) // 2] * 1000, 3)
+        summary["latency_ms_p99"] = round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+    return summary
+
+
+def export_to_dataset(paths, label=None, csv_file=CSV_FILE, **filters):
+    """
+    Append selected frames to `csv_file`, normalised the same way as
+    /add_landmarks, and add their labels to the gesture list next to it.
+    Uses the recorded prediction as label unless `label` is given.
+    Returns the number of rows written.
+    """
+    from landmark_utils import normalize_landmarks
+
+    ensure_csv(csv_file)
+
+    written = 0
+    labels = set()
+    with open(csv_file, "a", newline="") as f:
+        writer = csv.writer(f)
+        for rec in select_records(paths, **filters):
+            row_label = label or rec["gesture"]
+            if rec["landmarks"] is None or not row_label:
+                continue
+            writer.writerow([row_label] + normalize_landmarks(rec["landmarks"]).tolist())
+            labels.add(row_label)
+            written += 1
+
+    config_file = config_file_for(csv_file)
+    for row_label in labels:
+        update_config(row_label, config_file)
+    return written
+
+
+def _expand(patterns):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob.glob(pattern) or [pattern])
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or export landmark recordings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    replay_cmd = sub.add_parser("replay", help="feed a recording back through the classifier")
+    replay_cmd.add_argument("logs", nargs="+")
+    replay_cmd.add_argument("--speed", type=float, default=1.0,
+                            help="playback speed multiplier (0 = as fast as possible)")
+    replay_cmd.add_argument("--session")
+
+    export_cmd = sub.add_parser("export", help="append recorded frames to the training dataset")
+    export_cmd.add_argument("logs", nargs="+")
+    export_cmd.add_argument("--label", help="label for exported rows (default: recorded prediction)")
+    export_cmd.add_argument("--session")
+    export_cmd.add_argument("--start", type=float, help="unix timestamp of first frame")
+    export_cmd.add_argument("--end", type=float, help="unix timestamp of last frame")
+    export_cmd.add_argument("--gesture", help="only frames predicted as this gesture")
+    export_cmd.add_argument("--min-confidence", type=float)
+    export_cmd.add_argument("--csv", default=CSV_FILE,
+                            help="dataset to append to; its gesture_config.json is kept next to it")
+
+    args = parser.parse_args()
+    paths = _expand(args.logs)
+    if args.command == "replay":
+        print(replay(paths, speed=args.speed, session=args.session))
+    else:
+        written = export_to_dataset(
+            paths, label=args.label, csv_file=args.csv, session=args.session,
+            start=args.start, end=args.end, gesture=args.gesture,
+            min_confidence=args.min_confidence,
+        )
+        print(f"Exported {written} samples to {args.csv}")
+        if written:
+            print("Retrain the model to use them.")
+
+
+if __name__ == "__main__":
+    main()
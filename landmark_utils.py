@@ -45,4 +45,22 @@ def normalize_landmarks_row(flat_row):
     flat_row: array-like of length 63
     Returns: flat numpy array of length 63.
     """
-    return normalize_landmarks(np.array(flat_row, dtype=float))
\ No newline at end of file
+    return normalize_landmarks(np.array(flat_row, dtype=float))
+
+def normalize_landmarks_batch(rows):
+    """
+    Vectorised normalise_landmarks for many samples at once, done in place.
+    rows: float numpy array of shape (N, 63) — e.g. a chunk of CSV rows.
+    Returns: the same array, normalised (dtype is preserved, so float32 stays float32).
+    """
+    coords = rows.reshape(-1, 21, 3)
+
+    # Step 1 — wrist subtraction
+    coords -= coords[:, :1, :].copy()
+
+    # Step 2 — scale normalisation (rows with zero scale are left untouched)
+    scale = np.abs(coords).max(axis=(1, 2))
+    scale[scale == 0] = 1
+    coords /= scale[:, None, None]
+
+    return rows
@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 import threading
 import time
 import json
@@ -10,8 +11,15 @@ import csv
 
 from gesture_detector import detect_gesture, predict_from_landmarks, reload_model, CONFIDENCE_THRESHOLD
 from landmark_utils import normalize_landmarks
-from action_executor import execute_action, load_actions, update_action, remove_action
+from dataset_utils import CSV_FILE, CONFIG_FILE, ensure_csv, update_config
+from action_executor import load_actions, update_action, remove_action
 import retrain
+import profiler
+import landmark_recorder
+import gesture_combos
+import action_dispatch
+import shared_model
+from capture_pipeline import CapturePipeline, configured_source
 
 
 app = FastAPI()
@@ -20,36 +28,86 @@ templates = Jinja2Templates(directory="templates")
 
 current_gesture = None
 current_confidence = 0
+capture = None
+camera_thread = None
 system_running = False
+engine_generation = 0
 global_confidence_threshold = CONFIDENCE_THRESHOLD
 
-DATASET_DIR = "datasets"
-CSV_FILE = os.path.join(DATASET_DIR, "gesture_landmarks.csv")
-CONFIG_FILE = os.path.join(DATASET_DIR, "gesture_config.json")
+# Multi-worker mode: engine state lives in a shared control block so that
+# /start, /stop and the threshold apply to every worker
+shared_control = shared_model.SharedControl() if shared_model.enabled() else None
 
-def update_config(gesture):
-    if not os.path.exists(DATASET_DIR):
-        os.makedirs(DATASET_DIR)
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-        except json.JSONDecodeError:
-            config = {"gestures": []}
-    else:
-        config = {"gestures": []}
-    if gesture not in config["gestures"]:
-        config["gestures"].append(gesture)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-
-def camera_loop():
-    # Camera loop is no longer used for detection.
-    # Landmarks are now sent directly from the browser via /predict.
+def engine_running():
+    if shared_control is not None:
+        return shared_control.running
+    return system_running
+
+def set_engine_running(running):
     global system_running
-    print("System ready - using browser-side MediaPipe for detection")
-    while system_running:
-        time.sleep(1)
+    system_running = running
+    if shared_control is not None:
+        shared_control.running = running
+
+def start_generation():
+    """Begin a new engine run. Returns its generation number."""
+    global engine_generation
+    if shared_control is not None:
+        shared_control.generation += 1
+        return shared_control.generation
+    engine_generation += 1
+    return engine_generation
+
+def current_generation():
+    if shared_control is not None:
+        return shared_control.generation
+    return engine_generation
+
+def run_active(generation):
+    # A quick /stop + /start flips the running flag back before an old loop
+    # notices, so each loop also checks that its own run has not been replaced
+    return engine_running() and current_generation() == generation
+
+def confidence_threshold():
+    if shared_control is not None:
+        return shared_control.threshold
+    return global_confidence_threshold
+
+def single_worker_only(feature):
+    """
+    Error response for per-process tools under --workers, where start and stop
+    could reach different workers. None when running a single process.
+    """
+    if shared_control is None:
+        return None
+    return JSONResponse({"status": "error",
+                         "message": f"The {feature} is not available with --workers; "
+                                    f"run a single worker to use it"})
+
+CAPTURE_SESSION = "capture"
+CAPTURE_STOP_TIMEOUT = 5.0   # seconds /start waits for a previous capture to shut down
+
+def camera_loop(generation, source=None):
+    global capture
+    if source is None:
+        # No capture source: landmarks are sent directly from the browser via /predict.
+        print("System ready - using browser-side MediaPipe for detection")
+        while run_active(generation):
+            time.sleep(1)
+        print("System stopped")
+        return
+
+    # Server-side capture for kiosk / headless stations. The pipeline stays
+    # local so this loop always stops its own one, never a newer run's.
+    pipeline = CapturePipeline(source, lambda landmarks: classify_and_act(landmarks, CAPTURE_SESSION))
+    capture = pipeline
+    pipeline.start()
+    while run_active(generation) and pipeline.is_alive():
+        time.sleep(0.2)
+    pipeline.stop()
+    if run_active(generation):
+        # Video ended or the camera failed — allow /start again
+        set_engine_running(False)
     print("System stopped")
 
 @app.get("/")
@@ -61,21 +119,35 @@ async def dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 @app.get("/start")
-def start_system():
-    global system_running
-    if system_running:
+def start_system(source: str = None):
+    global camera_thread
+    if engine_running():
         return {"status": "already running"}
-    system_running = True
-    thread = threading.Thread(target=camera_loop, daemon=True)
-    thread.start()
+    # Let the previous run release the camera before opening it again
+    if camera_thread is not None and camera_thread.is_alive():
+        camera_thread.join(timeout=CAPTURE_STOP_TIMEOUT)
+        if camera_thread.is_alive():
+            return JSONResponse({"status": "error", "message": "previous capture is still stopping"})
+    source = source or configured_source()
+    generation = start_generation()
+    set_engine_running(True)
+    camera_thread = threading.Thread(target=camera_loop, args=(generation, source), daemon=True)
+    camera_thread.start()
+    if source is not None:
+        return {"status": "system started", "capture": source}
     return {"status": "system started"}
 
 @app.get("/stop")
 def stop_system():
-    global system_running
-    system_running = False
+    set_engine_running(False)
     return {"status": "system stopped"}
 
+@app.get("/capture")
+def capture_stats():
+    if capture is None:
+        return {"running": False}
+    return capture.stats()
+
 @app.get("/gesture")
 def get_gesture():
     return {"gesture": current_gesture, "confidence": current_confidence}
@@ -123,7 +195,7 @@ def get_actions():
 
 @app.post("/execute/{gesture}")
 def execute(gesture: str):
-    execute_action(gesture)
+    action_dispatch.execute(gesture)
     return {"status": "action executed"}
 
 @app.post("/retrain")
@@ -137,12 +209,13 @@ async def add_landmarks(request: Request):
     data = await request.json()
     gesture = data["gesture"]
     landmarks_list = data["landmarks"]
+    if profiler.armed:
+        return profiler.run("add_landmarks", save_landmarks, gesture, landmarks_list)
+    return save_landmarks(gesture, landmarks_list)
+
+def save_landmarks(gesture, landmarks_list):
     update_config(gesture)
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, "w", newline="") as f:
-            writer = csv.writer(f)
-            header = ["label"] + [f"{coord}{i}" for i in range(21) for coord in ["x","y","z"]]
-            writer.writerow(header)
+    ensure_csv(CSV_FILE)
     with open(CSV_FILE, "a", newline="") as f:
         writer = csv.writer(f)
         for landmarks in landmarks_list:
@@ -156,6 +229,7 @@ async def update_action_api(request: Request):
     gesture = data["gesture"]
     action = data["action"]
     update_action(gesture, action)
+    action_dispatch.rebuild()
     return {"status": "action updated"}
 
 @app.post("/remove_mapping")
@@ -166,9 +240,37 @@ async def remove_mapping_api(request: Request):
         return JSONResponse({"status": "error", "message": "No gesture specified"})
     success = remove_action(gesture)
     if success:
+        action_dispatch.rebuild()
         return {"status": "success", "message": f"Mapping for '{gesture}' removed"}
     return JSONResponse({"status": "error", "message": f"No mapping found for '{gesture}'"})
 
+@app.get("/combos")
+def get_combos():
+    return gesture_combos.load_combos()
+
+@app.post("/update_combo")
+async def update_combo_api(request: Request):
+    data = await request.json()
+    sequence = data["sequence"]
+    action = data["action"]
+    timeout = data.get("timeout", gesture_combos.DEFAULT_TIMEOUT)
+    try:
+        gesture_combos.update_combo(sequence, action, timeout)
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+    action_dispatch.rebuild()
+    return {"status": "combo updated"}
+
+@app.post("/remove_combo")
+async def remove_combo_api(request: Request):
+    data = await request.json()
+    sequence = data.get("sequence")
+    if not sequence:
+        return JSONResponse({"status": "error", "message": "No sequence specified"})
+    if gesture_combos.remove_combo(sequence):
+        action_dispatch.rebuild()
+        return {"status": "success", "message": f"Combo {' → '.join(sequence)} removed"}
+    return JSONResponse({"status": "error", "message": f"No combo found for {' → '.join(sequence)}"})
 
 @app.get("/gestures")
 def get_gestures():
@@ -185,20 +287,119 @@ async def update_confidence(request: Request):
     global global_confidence_threshold
     data = await request.json()
     global_confidence_threshold = float(data["threshold"])
+    if shared_control is not None:
+        shared_control.threshold = global_confidence_threshold
     return {"status": "updated"}
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    import gesture_detector
+    parser = argparse.ArgumentParser(description="Gesture control backend")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes sharing one memory-mapped model")
+    args = parser.parse_args()
+    if args.workers > 1:
+        # Publish the model once; workers map it instead of unpickling their own copy
+        if gesture_detector.knn is not None:
+            shared_model.publish(gesture_detector.knn, gesture_detector.scaler,
+                                 gesture_detector.class_names, gesture_detector.model_version)
+        shared_model.init_control(CONFIDENCE_THRESHOLD)
+        # Cooldowns and combo progress must see every frame, whichever worker
+        # classified it — actions run in this process for all workers
+        action_dispatch.serve()
+        os.environ[shared_model.ENV_FLAG] = "1"
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, workers=args.workers)
+    else:
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
 
 @app.post("/predict")
 async def predict(request: Request):
-    global current_gesture, current_confidence
     data = await request.json()
     landmarks = data.get("landmarks")
+    session = data.get("session", "default")
+    seq = data.get("seq")
+    # Inference is CPU-bound — keep it off the event loop
+    if profiler.armed:
+        return await run_in_threadpool(profiler.run, "predict", classify_and_act, landmarks, session, seq)
+    return await run_in_threadpool(classify_and_act, landmarks, session, seq)
+
+def classify_and_act(landmarks, session="default", seq=None):
+    global current_gesture, current_confidence
     gesture, confidence = predict_from_landmarks(landmarks)
     current_gesture = gesture
     current_confidence = confidence
-    if gesture and confidence > global_confidence_threshold and system_running:
-        execute_action(gesture)
-    return {"gesture": gesture, "confidence": confidence}
\ No newline at end of file
+    action = None
+    if engine_running():
+        # Frames without a confident gesture release the one being held
+        confident = gesture if gesture and confidence > confidence_threshold() else None
+        action = action_dispatch.feed(session, confident, seq)
+    if landmark_recorder.active:
+        landmark_recorder.record(session, landmarks, gesture, confidence, action)
+    return {"gesture": gesture, "confidence": confidence}
+
+@app.post("/admin/profile")
+async def arm_profiler(request: Request):
+    unavailable = single_worker_only("profiler")
+    if unavailable is not None:
+        return unavailable
+    data = await request.json()
+    try:
+        profiler.arm(
+            requests=data.get("requests"),
+            seconds=data.get("seconds"),
+            mode=data.get("mode", "cprofile"),
+            endpoints=data.get("endpoints", profiler.PROFILED_ENDPOINTS),
+        )
+    except (ValueError, RuntimeError) as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+    return {"status": "profiler armed"}
+
+@app.get("/admin/profile")
+def profiler_status():
+    unavailable = single_worker_only("profiler")
+    if unavailable is not None:
+        return unavailable
+    return profiler.status()
+
+@app.post("/admin/profile/stop")
+def stop_profiler():
+    unavailable = single_worker_only("profiler")
+    if unavailable is not None:
+        return unavailable
+    result = profiler.stop()
+    if result is None:
+        return JSONResponse({"status": "error", "message": "Profiler is not armed"})
+    return {"status": "profile saved", "result": result}
+
+@app.post("/recording/start")
+async def start_recording(request: Request):
+    unavailable = single_worker_only("recorder")
+    if unavailable is not None:
+        return unavailable
+    data = await request.json()
+    try:
+        landmark_recorder.start_recording(
+            directory=data.get("directory", landmark_recorder.RECORDINGS_DIR),
+            max_bytes=int(data.get("max_bytes", landmark_recorder.MAX_BYTES)),
+        )
+    except RuntimeError as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+    return {"status": "recording started"}
+
+@app.post("/recording/stop")
+def stop_recording():
+    unavailable = single_worker_only("recorder")
+    if unavailable is not None:
+        return unavailable
+    result = landmark_recorder.stop_recording()
+    if result is None:
+        return JSONResponse({"status": "error", "message": "Recorder is not running"})
+    return {"status": "recording stopped", "result": result}
+
+@app.get("/recording")
+def recording_status():
+    unavailable = single_worker_only("recorder")
+    if unavailable is not None:
+        return unavailable
+    return landmark_recorder.status()
@@ -0,0 +1,252 @@
+"""
+On-demand profiling of the live prediction path.
+
+Armed through the /admin/profile endpoint (main.py) for the next N requests
+and/or T seconds on /predict and /add_landmarks. Two profilers are available:
+
+  - cprofile  — deterministic, exact call counts, saved as a .pstats file
+  - sampling  — a background thread snapshots the request thread's stack every
+                SAMPLE_INTERVAL seconds, saved as collapsed stacks
+                (one "frame;frame;frame count" line per stack, flamegraph-ready)
+
+When nothing is armed the hot path only checks the module-level `armed` flag.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+
+import gesture_detector
+
+PROFILES_DIR = "profiles"
+CSV_FILE = os.path.join("datasets", "gesture_landmarks.csv")
+
+PROFILED_ENDPOINTS = ("predict", "add_landmarks")
+MODES = ("cprofile", "sampling", "both")
+
+SAMPLE_INTERVAL = 0.001   # seconds between stack samples
+TOP_FUNCTIONS   = 25      # rows of the pstats summary returned to the caller
+
+# Checked on the hot path — everything else is only touched while armed
+armed = False
+
+_lock        = threading.Lock()
+_session     = None
+_last_result = None
+
+
+class _Sampler(threading.Thread):
+    """Samples the stack of whichever thread is inside a profiled request."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.target_thread = None
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            thread_id = self.target_thread
+            if thread_id is None:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        lines = [f"{stack} {count}" for stack, count in
+                 sorted(self.stacks.items(), key=lambda item: -item[1])]
+        return "\n".join(lines) + "\n"
+
+
+class _Session:
+    def __init__(self, requests, seconds, mode, endpoints):
+        self.remaining = requests
+        self.deadline  = time.time() + seconds if seconds else None
+        self.mode      = mode
+        self.endpoints = endpoints
+        self.started   = time.time()
+        self.profiled  = {endpoint: 0 for endpoint in endpoints}
+        self.profile   = cProfile.Profile() if mode in ("cprofile", "both") else None
+        self.sampler   = _Sampler() if mode in ("sampling", "both") else None
+        # Ends the session at the deadline even if no request arrives to notice it
+        self.timer     = threading.Timer(seconds, _on_deadline, (self,)) if seconds else None
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.timer is not None:
+            self.timer.daemon = True
+            self.timer.start()
+
+    def expired(self):
+        if self.remaining is not None and self.remaining <= 0:
+            return True
+        return self.deadline is not None and time.time() >= self.deadline
+
+
+def arm(requests=None, seconds=None, mode="cprofile", endpoints=PROFILED_ENDPOINTS):
+    """
+    Start profiling the next `requests` calls and/or the next `seconds` seconds
+    (whichever runs out first). At least one of the two limits is required.
+    """
+    global armed, _session
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}' (expected one of {MODES})")
+    if not requests and not seconds:
+        raise ValueError("Specify a number of requests and/or seconds to profile")
+    unknown = [endpoint for endpoint in endpoints if endpoint not in PROFILED_ENDPOINTS]
+    if unknown:
+        raise ValueError(f"Cannot profile endpoints {unknown}")
+    with _lock:
+        if _session is not None:
+            raise RuntimeError("Profiler is already armed")
+        _session = _Session(requests, seconds, mode, tuple(endpoints))
+        armed = True
+    print(f"Profiler armed: mode={mode} requests={requests} seconds={seconds}")
+
+
+def run(endpoint, fn, *args):
+    """Call fn(*args) under the armed profiler if `endpoint` is being profiled."""
+    with _lock:
+        session = _session
+        if session is None or endpoint not in session.endpoints or session.expired():
+            # An expired session is finished by its deadline timer
+            return fn(*args)
+        # Holding the lock serialises profiled calls, which keeps a single
+        # cProfile.Profile from being enabled on two threads at once.
+        if session.sampler is not None:
+            session.sampler.target_thread = threading.get_ident()
+        if session.profile is not None:
+            session.profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            if session.profile is not None:
+                session.profile.disable()
+            if session.sampler is not None:
+                session.sampler.target_thread = None
+            session.profiled[endpoint] += 1
+            if session.remaining is not None:
+                session.remaining -= 1
+            if session.expired():
+                _detach()
+                # Writing the profile files is not this request's job
+                threading.Thread(target=_save, args=(session,), daemon=True).start()
+
+
+def status():
+    """Current profiler state plus the result of the last finished session."""
+    with _lock:
+        if _session is None:
+            return {"armed": False, "last_result": _last_result}
+        return {
+            "armed":     True,
+            "mode":      _session.mode,
+            "endpoints": list(_session.endpoints),
+            "remaining": _session.remaining,
+            "seconds_left": (max(0.0, _session.deadline - time.time())
+                             if _session.deadline is not None else None),
+            "profiled":  dict(_session.profiled),
+            "last_result": _last_result,
+        }
+
+
+def stop():
+    """Finish the armed session early and return its result."""
+    with _lock:
+        session = _session
+        if session is None:
+            return None
+        _detach()
+    return _save(session)
+
+
+def dataset_size():
+    if not os.path.exists(CSV_FILE):
+        return 0
+    with open(CSV_FILE, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def _on_deadline(session):
+    with _lock:
+        if _session is not session:
+            return   # already finished by its request limit or stop()
+        _detach()
+    _save(session)
+
+
+def _detach():
+    """Disarm the current session. Caller must hold _lock."""
+    global armed, _session
+    if _session.timer is not None:
+        _session.timer.cancel()
+    _session = None
+    armed    = False
+
+
+def _save(session):
+    """Write a detached session's profiles to disk and return the result."""
+    global _last_result
+    if session.sampler is not None:
+        session.sampler.stop()
+
+    if not os.path.exists(PROFILES_DIR):
+        os.makedirs(PROFILES_DIR)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base  = os.path.join(PROFILES_DIR, f"profile_{stamp}")
+
+    result = {
+        "mode":          session.mode,
+        "profiled":      session.profiled,
+        "duration":      round(time.time() - session.started, 3),
+        "model_version": gesture_detector.current_model_version(),
+        "dataset_size":  dataset_size(),
+        "files":         {},
+    }
+
+    if session.profile is not None:
+        pstats_file = base + ".pstats"
+        session.profile.dump_stats(pstats_file)
+        result["files"]["pstats"] = pstats_file
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(session.profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        except TypeError:
+            # pstats raises when the profile is empty (nothing was profiled)
+            out.write("No calls recorded.\n")
+        result["summary"] = out.getvalue()
+
+    if session.sampler is not None:
+        collapsed_file = base + ".collapsed"
+        with open(collapsed_file, "w") as f:
+            f.write(session.sampler.collapsed())
+        result["files"]["collapsed"] = collapsed_file
+        result["samples"] = session.sampler.samples
+
+    with open(base + ".json", "w") as f:
+        json.dump(result, f, indent=4)
+    result["files"]["meta"] = base + ".json"
+
+    _last_result = result
+    print(f"Profile saved to {base}.*")
+    return result
@@ -1,6 +1,12 @@
 import os
+import sys
 import json
+import time
 import pickle
+import argparse
+import subprocess
+import tempfile
+import tracemalloc
 import pandas as pd
 import numpy as np
 
@@ -8,7 +14,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import accuracy_score, classification_report
-from landmark_utils import normalize_landmarks_row
+from sklearn import config_context
+from landmark_utils import normalize_landmarks_row, normalize_landmarks_batch
 
 DATASET_DIR = "datasets"
 MODELS_DIR = "models"
@@ -20,6 +27,13 @@ CLASS_FILE = os.path.join(MODELS_DIR, "class_names_knn.json")
 
 K = 5
 
+# Streaming mode — bounded-memory retraining for very large datasets
+STREAMING_THRESHOLD_MB = 200   # main() switches to streaming above this CSV size
+MEMORY_BUDGET_MB       = 512   # default peak-memory budget for streaming mode
+CSV_ROW_OVERHEAD       = 1536  # measured peak bytes per row while a chunk is processed
+MIN_CHUNK_ROWS         = 256
+N_FEATURES             = 63
+
 def initialize():
     if not os.path.exists(MODELS_DIR):
         os.makedirs(MODELS_DIR)
@@ -28,9 +42,9 @@ def initialize():
         print("Collect data first via dashboard or collector script.")
         
 
-def load_dataset():
+def load_dataset(csv_file=CSV_FILE):
     print("\nLoading dataset...")
-    df = pd.read_csv(CSV_FILE)
+    df = pd.read_csv(csv_file)
     if len(df) < 10:
         print("ERROR: Not enough samples.")
         return None, None, None
@@ -78,15 +92,297 @@ def save_model(knn, scaler, class_names):
     print(SCALER_FILE)
     print(CLASS_FILE)
 
-def main():
+# ─── STREAMING MODE ──────────────────────────────────────────────────────────
+
+def _fixed_bytes(n_rows):
+    """Memory that has to exist at once regardless of chunking."""
+    matrix = n_rows * N_FEATURES * 4   # final float32 train + test matrices
+    index  = n_rows * (4 + 8 + 1)      # labels, destination rows, train mask
+    return matrix + index
+
+def _chunk_rows(free_bytes):
+    return max(MIN_CHUNK_ROWS, int(free_bytes // CSV_ROW_OVERHEAD))
+
+def scan_labels(csv_file, chunk_rows):
+    """Pass 1: read only the label column. Returns (y, class_names)."""
+    seen  = {}
+    parts = []
+    for chunk in pd.read_csv(csv_file, usecols=[0], chunksize=chunk_rows):
+        codes, uniques = pd.factorize(chunk.iloc[:, 0])
+        lookup = np.array([seen.setdefault(label, len(seen)) for label in uniques],
+                          dtype=np.int32)
+        parts.append(lookup[codes])
+    class_names = sorted(seen)
+    # Remap first-seen indices to sorted order, matching load_dataset()
+    remap = np.empty(len(seen), dtype=np.int32)
+    for label, i in seen.items():
+        remap[i] = class_names.index(label)
+    y = remap[np.concatenate(parts)] if parts else np.empty(0, dtype=np.int32)
+    return y, class_names
+
+def load_dataset_streaming(csv_file, y, chunk_rows, stats):
+    """
+    Pass 2: read features chunk by chunk straight into preallocated float32
+    train/test matrices (same stratified split as train_model), normalising in
+    place and fitting the scaler with running statistics on the train rows.
+    """
+    n = len(y)
+    train_idx, test_idx = train_test_split(
+        np.arange(n), test_size=0.2, random_state=42, stratify=y
+    )
+    is_train = np.zeros(n, dtype=bool)
+    is_train[train_idx] = True
+    dest = np.empty(n, dtype=np.int64)
+    dest[train_idx] = np.arange(len(train_idx))
+    dest[test_idx]  = np.arange(len(test_idx))
+    y_train, y_test = y[train_idx], y[test_idx]
+    del train_idx, test_idx
+
+    X_train = np.empty((len(y_train), N_FEATURES), dtype=np.float32)
+    X_test  = np.empty((len(y_test), N_FEATURES), dtype=np.float32)
+    scaler  = StandardScaler()
+
+    start = 0
+    for chunk in pd.read_csv(csv_file, usecols=range(1, N_FEATURES + 1),
+                             dtype=np.float32, chunksize=chunk_rows):
+        rows = normalize_landmarks_batch(chunk.to_numpy(dtype=np.float32))
+        end  = start + len(rows)
+        mask = is_train[start:end]
+        rows_dest  = dest[start:end]
+        train_rows = rows[mask]
+        X_train[rows_dest[mask]] = train_rows
+        X_test[rows_dest[~mask]] = rows[~mask]
+        if len(train_rows):
+            scaler.partial_fit(train_rows)
+        del chunk, rows, train_rows
+        start = end
+        stats["chunks"] += 1
+
+    # Scale in place — StandardScaler keeps float32 when copy=False
+    scaler.transform(X_train, copy=False)
+    scaler.transform(X_test, copy=False)
+    return X_train, X_test, y_train, y_test, scaler
+
+def evaluate_streaming(knn, X_test, y_test, class_names, batch_rows, working_memory_mb):
+    """Predict the test set in batches, accumulating a confusion matrix."""
+    k  = len(class_names)
+    cm = np.zeros((k, k), dtype=np.int64)
+    with config_context(working_memory=working_memory_mb):
+        for start in range(0, len(X_test), batch_rows):
+            y_true = y_test[start:start + batch_rows]
+            y_pred = knn.predict(X_test[start:start + batch_rows])
+            cm += np.bincount(y_true * k + y_pred, minlength=k * k).reshape(k, k)
+    return cm
+
+def print_confusion_report(cm, class_names):
+    total    = cm.sum()
+    accuracy = np.trace(cm) / total if total else 0.0
+    print(f"\nAccuracy: {accuracy * 100:.2f}%")
+    print("\nClassification Report:")
+    width = max(len(str(name)) for name in class_names + ["weighted avg"])
+    print(f"{'':>{width}}  precision    recall  f1-score   support\n")
+    tp        = np.diag(cm).astype(float)
+    support   = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall    = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+    for i, name in enumerate(class_names):
+        print(f"{name:>{width}}  {precision[i]:9.2f} {recall[i]:9.2f} {f1[i]:9.2f} {support[i]:9d}")
+    weights = support / total if total else support
+    print(f"\n{'macro avg':>{width}}  {precision.mean():9.2f} {recall.mean():9.2f} {f1.mean():9.2f} {total:9d}")
+    print(f"{'weighted avg':>{width}}  {(precision * weights).sum():9.2f} "
+          f"{(recall * weights).sum():9.2f} {(f1 * weights).sum():9.2f} {total:9d}")
+    return accuracy
+
+def train_streaming(csv_file=CSV_FILE, memory_budget_mb=MEMORY_BUDGET_MB, trace_memory=False):
+    """
+    Bounded-memory retraining. Returns (knn, scaler, class_names, report) or
+    None if the dataset is unusable or cannot fit in the memory budget.
+
+    trace_memory: measure peak allocations with tracemalloc. tracemalloc is
+    process-wide, so only the CLI turns it on; inside the server it would
+    also trace every /predict thread for the whole retrain.
+    """
+    budget = memory_budget_mb * 1024 * 1024
+    report = {"memory_budget_mb": memory_budget_mb, "chunks": 0, "timings": {}}
+    peak = None
+    # Leave tracing that someone else started running; only measure our peak
+    owns_tracing = trace_memory and not tracemalloc.is_tracing()
+    if owns_tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+    try:
+        t0 = time.perf_counter()
+        print("\nScanning labels...")
+        y, class_names = scan_labels(csv_file, _chunk_rows(budget))
+        n = len(y)
+        report["timings"]["scan"] = time.perf_counter() - t0
+        if n < 10:
+            print("ERROR: Not enough samples.")
+            return None
+
+        free = budget - _fixed_bytes(n)
+        if free < MIN_CHUNK_ROWS * CSV_ROW_OVERHEAD:
+            needed = (_fixed_bytes(n) + MIN_CHUNK_ROWS * CSV_ROW_OVERHEAD) / 2**20
+            print(f"ERROR: {n} samples need at least {needed:.0f} MB; "
+                  f"memory budget is {memory_budget_mb} MB.")
+            return None
+        chunk_rows = _chunk_rows(free)
+        print(f"Samples: {n}, classes: {class_names}")
+        print(f"Reading in chunks of {chunk_rows} rows...")
+
+        t0 = time.perf_counter()
+        X_train, X_test, y_train, y_test, scaler = load_dataset_streaming(
+            csv_file, y, chunk_rows, report
+        )
+        del y
+        report["timings"]["load"] = time.perf_counter() - t0
+
+        print("Training KNN model...")
+        t0 = time.perf_counter()
+        knn = KNeighborsClassifier(n_neighbors=K, weights='distance', metric='euclidean')
+        knn.fit(X_train, y_train)
+        report["timings"]["fit"] = time.perf_counter() - t0
+
+        print("Testing model...")
+        t0 = time.perf_counter()
+        # Each predicted row needs a distance row over the whole train set
+        batch_rows = max(1, int(free // (len(X_train) * 8 * 2)))
+        working_memory_mb = max(1, int(free / 2**20 / 2))
+        cm = evaluate_streaming(knn, X_test, y_test, class_names, batch_rows, working_memory_mb)
+        report["timings"]["evaluate"] = time.perf_counter() - t0
+        report["accuracy"] = print_confusion_report(cm, class_names)
+
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if owns_tracing:
+            tracemalloc.stop()
+
+    report["samples"]        = n
+    report["chunk_rows"]     = chunk_rows
+    report["matrix_mb"]      = n * N_FEATURES * 4 / 2**20
+    report["peak_traced_mb"] = peak / 2**20 if peak is not None else None
+    report["peak_rss_mb"]    = _peak_rss_mb()
+    _print_memory_report(report)
+    return knn, scaler, class_names, report
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def _print_memory_report(report):
+    n     = report["samples"]
+    total = sum(report["timings"].values())
+    print("\nStreaming retrain report:")
+    print(f"  samples            {n}")
+    print(f"  chunks             {report['chunks']} x {report['chunk_rows']} rows")
+    print(f"  training matrices  {report['matrix_mb']:.1f} MB (float32)")
+    if report["peak_traced_mb"] is not None:
+        print(f"  peak traced memory {report['peak_traced_mb']:.1f} MB "
+              f"(budget {report['memory_budget_mb']} MB, "
+              f"{report['peak_traced_mb'] * 2**20 / n:.0f} bytes/sample)")
+    if report["peak_rss_mb"] is not None:
+        print(f"  process peak RSS   {report['peak_rss_mb']:.1f} MB")
+    for phase, seconds in report["timings"].items():
+        print(f"  {phase:<18} {seconds:.2f} s")
+    print(f"  total              {total:.2f} s ({total * 1e6 / n:.1f} us/sample)")
+
+def scaling_benchmark(factors, csv_file=CSV_FILE, memory_budget_mb=MEMORY_BUDGET_MB):
+    """
+    Retrain in streaming mode on the dataset replicated `factor` times, each
+    run in a fresh process so peak RSS is measured per size. Nothing is saved.
+    """
+    with open(csv_file, "r") as f:
+        header = f.readline()
+        body   = f.read()
+    if body and not body.endswith("\n"):
+        body += "\n"
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            path = os.path.join(tmp, f"dataset_x{factor}.csv")
+            with open(path, "w") as f:
+                f.write(header)
+                for _ in range(factor):
+                    f.write(body)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--streaming", "--no-save",
+                 "--csv", path, "--memory-budget", str(memory_budget_mb), "--json-report"],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+            if out.returncode != 0 or not lines:
+                print(f"x{factor}: failed\n{out.stdout[-500:]}{out.stderr[-500:]}")
+                continue
+            results.append(json.loads(lines[-1]))
+
+    print("\nScaling (streaming mode):")
+    print(f"{'samples':>10} {'matrix MB':>10} {'traced MB':>10} {'RSS MB':>8} {'seconds':>8} {'us/sample':>10}")
+    for r in results:
+        total = sum(r["timings"].values())
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        traced = f"{r['peak_traced_mb']:.1f}" if r["peak_traced_mb"] is not None else "n/a"
+        print(f"{r['samples']:>10} {r['matrix_mb']:>10.1f} {traced:>10} "
+              f"{rss:>8} {total:>8.2f} {total * 1e6 / r['samples']:>10.1f}")
+    return results
+
+def main(streaming=None, memory_budget_mb=MEMORY_BUDGET_MB, csv_file=CSV_FILE, save=True,
+         trace_memory=False):
+    """
+    streaming: True/False to force a mode; None picks streaming automatically
+               when the dataset is larger than STREAMING_THRESHOLD_MB.
+    trace_memory: report tracemalloc peaks in streaming mode (CLI only).
+    """
     initialize()
-    X, y, class_names = load_dataset()
+    if streaming is None:
+        streaming = (os.path.exists(csv_file) and
+                     os.path.getsize(csv_file) > STREAMING_THRESHOLD_MB * 1024 * 1024)
+    if streaming:
+        result = train_streaming(csv_file, memory_budget_mb, trace_memory)
+        if result is None:
+            print("Cannot train - no valid dataset.")
+            return None
+        knn, scaler, class_names, report = result
+        if save:
+            save_model(knn, scaler, class_names)
+        print("\nRetraining complete.")
+        return report
+    X, y, class_names = load_dataset(csv_file)
     if X is None:
         print("Cannot train - no valid dataset.")
         return
     knn, scaler = train_model(X, y)
-    save_model(knn, scaler, class_names)
+    if save:
+        save_model(knn, scaler, class_names)
     print("\nRetraining complete.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Retrain the gesture KNN model")
+    parser.add_argument("--streaming", action="store_true",
+                        help="bounded-memory mode for very large datasets")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET_MB,
+                        help="peak memory budget in MB for streaming mode")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--no-save", action="store_true", help="train and evaluate only")
+    parser.add_argument("--json-report", action="store_true",
+                        help="print the streaming report as a JSON line")
+    parser.add_argument("--scaling", metavar="FACTORS",
+                        help="comma-separated dataset replication factors to benchmark, e.g. 1,4,16")
+    args = parser.parse_args()
+    if args.scaling:
+        scaling_benchmark([int(f) for f in args.scaling.split(",")], args.csv, args.memory_budget)
+    else:
+        report = main(streaming=True if args.streaming else None,
+                      memory_budget_mb=args.memory_budget,
+                      csv_file=args.csv, save=not args.no_save, trace_memory=True)
+        if args.json_report and report:
+            print(json.dumps(report))
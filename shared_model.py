@@ -0,0 +1,289 @@
+"""
+Shared, memory-mapped model for multi-worker serving (python main.py --workers N).
+
+Instead of every worker unpickling its own copy of the KNN model, the model is
+published once as a flat binary file that all workers map read-only, so the
+training matrix lives in the OS page cache exactly once:
+
+  models/shared_model_<version>.bin   header + JSON metadata + aligned arrays
+  models/shared_model.current         name of the file workers should map
+
+Publishing a new version writes a new versioned file and then atomically
+replaces the pointer file. Workers re-check the pointer at most every
+RELOAD_CHECK_INTERVAL seconds and swap to the new mapping; requests already
+running keep the old one. The pointer indirection (rather than replacing the
+mapped file itself) keeps this working on Windows, where a mapped file cannot
+be replaced or deleted.
+
+Inference is a brute-force distance-weighted KNN over the mapped arrays,
+matching KNeighborsClassifier(weights='distance', metric='euclidean').
+
+The same directory also holds a tiny read/write control block
+(shared_control.bin) so /start, /stop and the confidence threshold apply to
+every worker, not just the one that served the request.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+ENV_FLAG = "GESTURE_SHARED_MODEL"
+
+MODELS_DIR = "models"
+POINTER_FILE = os.path.join(MODELS_DIR, "shared_model.current")
+CONTROL_FILE = os.path.join(MODELS_DIR, "shared_control.bin")
+
+MAGIC = b"GSHM"
+HEADER = struct.Struct("<4sI")      # magic, metadata length
+CONTROL = struct.Struct("<B7xdQ")   # running flag, confidence threshold, run generation
+RUNNING_FIELD    = struct.Struct("<B")
+THRESHOLD_FIELD  = struct.Struct("<d")
+GENERATION_FIELD = struct.Struct("<Q")
+THRESHOLD_OFFSET  = 8
+GENERATION_OFFSET = 16
+ALIGN = 64
+
+RELOAD_CHECK_INTERVAL = 1.0   # seconds between pointer-file checks per worker
+
+
+def enabled():
+    return os.environ.get(ENV_FLAG) == "1"
+
+
+# ─── PUBLISHING ──────────────────────────────────────────────────────────────
+
+def model_filename(version):
+    return f"shared_model_{version}.bin"
+
+def publish(knn, scaler, class_names, version):
+    """Write the model as a versioned shared file and point workers at it."""
+    X = np.ascontiguousarray(knn._fit_X, dtype=np.float32)
+    arrays = {
+        "X":        X,
+        "sq_norms": np.einsum("ij,ij->i", X, X),
+        "y":        np.ascontiguousarray(knn._y, dtype=np.int32),
+        "classes":  np.ascontiguousarray(knn.classes_, dtype=np.int64),
+        "mean":     np.ascontiguousarray(scaler.mean_, dtype=np.float64),
+        "scale":    np.ascontiguousarray(scaler.scale_, dtype=np.float64),
+    }
+    meta = {
+        "version":     version,
+        "class_names": class_names,
+        "n_neighbors": knn.n_neighbors,
+        "weights":     knn.weights,
+        "arrays":      {},
+    }
+    # Offsets are relative to the end of the metadata block, each ALIGN-aligned
+    offset = 0
+    for name, array in arrays.items():
+        meta["arrays"][name] = [offset, array.dtype.str, list(array.shape)]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    data_start = -(-(HEADER.size + len(meta_bytes)) // ALIGN) * ALIGN
+
+    if not os.path.exists(MODELS_DIR):
+        os.makedirs(MODELS_DIR)
+    path = os.path.join(MODELS_DIR, model_filename(version))
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + meta["arrays"][name][0])
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    _replace_with_retry(POINTER_FILE, os.path.basename(path).encode("utf-8"))
+    _remove_old_versions(os.path.basename(path))
+    print(f"Published shared model version {version}")
+    return path
+
+def published_version():
+    model = _read_pointer()
+    if model is None:
+        return None
+    return model[len("shared_model_"):-len(".bin")]
+
+def _replace_with_retry(path, data, attempts=5):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    for attempt in range(attempts):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # Windows: another worker may be reading the pointer right now
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+def _remove_old_versions(keep):
+    for name in os.listdir(MODELS_DIR):
+        if name.startswith("shared_model_") and name.endswith(".bin") and name != keep:
+            try:
+                os.remove(os.path.join(MODELS_DIR, name))
+            except OSError:
+                pass   # still mapped by a worker on Windows — removed next time
+
+
+# ─── MAPPING ─────────────────────────────────────────────────────────────────
+
+class SharedModel:
+    """Read-only view of a published model file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, meta_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shared model file")
+        meta = json.loads(bytes(self._map[HEADER.size:HEADER.size + meta_len]))
+        data_start = -(-(HEADER.size + meta_len) // ALIGN) * ALIGN
+
+        self.version     = meta["version"]
+        self.class_names = meta["class_names"]
+        self.n_neighbors = meta["n_neighbors"]
+        self.weights     = meta["weights"]
+        arrays = {}
+        for name, (offset, dtype, shape) in meta["arrays"].items():
+            dtype  = np.dtype(dtype)
+            start  = data_start + offset
+            nbytes = dtype.itemsize * int(np.prod(shape))
+            arrays[name] = self._map[start:start + nbytes].view(dtype).reshape(shape)
+        self.X        = arrays["X"]
+        self.sq_norms = arrays["sq_norms"]
+        self.y        = arrays["y"]
+        self.classes  = arrays["classes"]
+        self.mean     = arrays["mean"]
+        self.scale    = arrays["scale"]
+
+    def predict(self, features):
+        """
+        features: normalised landmarks, shape (63,)
+        Returns: (gesture_name, confidence)
+        """
+        x  = ((features - self.mean) / self.scale).astype(np.float32)
+        d2 = self.sq_norms - 2.0 * (self.X @ x) + x @ x
+        np.maximum(d2, 0, out=d2)
+
+        k = min(self.n_neighbors, len(d2))
+        neighbors = np.argpartition(d2, k - 1)[:k] if k < len(d2) else np.arange(k)
+        dist = np.sqrt(d2[neighbors])
+        if self.weights == "distance":
+            # Same rule as sklearn: exact matches take all the weight
+            exact = dist == 0
+            weights = exact.astype(np.float64) if exact.any() else 1.0 / dist
+        else:
+            weights = np.ones(k)
+        votes = np.bincount(self.y[neighbors], weights=weights, minlength=len(self.classes))
+        best = int(np.argmax(votes))
+        confidence = votes[best] / votes.sum() * 100
+        return self.class_names[self.classes[best]], confidence
+
+
+_current     = None
+_pointer_key = None
+_next_check  = 0.0
+_check_lock  = threading.Lock()
+
+
+def current():
+    """The model workers should use now, remapping if a new version was published."""
+    global _next_check
+    now = time.monotonic()
+    if now >= _next_check and _check_lock.acquire(blocking=False):
+        try:
+            _next_check = now + RELOAD_CHECK_INTERVAL
+            _check_pointer()
+        finally:
+            _check_lock.release()
+    return _current
+
+def attach():
+    """Map the published model immediately. Returns it, or None if none is published."""
+    with _check_lock:
+        _check_pointer()
+    return _current
+
+def _read_pointer():
+    try:
+        with open(POINTER_FILE, "rb") as f:
+            return f.read().decode("utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+def _check_pointer():
+    global _current, _pointer_key
+    try:
+        stat = os.stat(POINTER_FILE)
+    except FileNotFoundError:
+        return
+    key = (stat.st_mtime_ns, stat.st_size)
+    if key == _pointer_key:
+        return
+    name = _read_pointer()
+    if name is None:
+        return
+    path = os.path.join(MODELS_DIR, name)
+    if _current is None or _current.path != path:
+        model = SharedModel(path)
+        # A single reference swap — in-flight requests keep the old mapping
+        _current = model
+        print(f"Mapped shared model version {model.version} (pid {os.getpid()})")
+    _pointer_key = key
+
+
+# ─── CONTROL BLOCK ───────────────────────────────────────────────────────────
+
+class SharedControl:
+    """Engine state shared by all workers through a small memory-mapped file."""
+
+    def __init__(self, path=CONTROL_FILE):
+        with open(path, "r+b") as f:
+            self._map = mmap.mmap(f.fileno(), CONTROL.size)
+
+    # Each field is read and written on its own so that concurrent updates of
+    # different fields from different workers cannot undo each other
+
+    @property
+    def running(self):
+        return bool(RUNNING_FIELD.unpack_from(self._map, 0)[0])
+
+    @running.setter
+    def running(self, value):
+        RUNNING_FIELD.pack_into(self._map, 0, int(bool(value)))
+
+    @property
+    def threshold(self):
+        return THRESHOLD_FIELD.unpack_from(self._map, THRESHOLD_OFFSET)[0]
+
+    @threshold.setter
+    def threshold(self, value):
+        THRESHOLD_FIELD.pack_into(self._map, THRESHOLD_OFFSET, float(value))
+
+    @property
+    def generation(self):
+        """Bumped on every /start so a stale capture loop in any worker can tell it was replaced."""
+        return GENERATION_FIELD.unpack_from(self._map, GENERATION_OFFSET)[0]
+
+    @generation.setter
+    def generation(self, value):
+        GENERATION_FIELD.pack_into(self._map, GENERATION_OFFSET, int(value))
+
+
+def init_control(threshold):
+    """Create the control block (engine stopped). Called once by the launcher."""
+    if not os.path.exists(MODELS_DIR):
+        os.makedirs(MODELS_DIR)
+    with open(CONTROL_FILE, "wb") as f:
+        f.write(CONTROL.pack(0, float(threshold), 0))
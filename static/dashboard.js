@@ -61,12 +61,17 @@ function setSystemStatus(state) {
     text.innerText = s.label;
 }
 
+// Identifies this dashboard tab to the backend (recordings, per-session state)
+const SESSION_ID = Math.random().toString(36).slice(2, 10);
+// Requests are not awaited one by one, so the backend uses this to keep frames in order
+let predictSeq = 0;
+
 async function sendLandmarksForPrediction(landmarks) {
     try {
         const res = await fetch('/predict', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ landmarks })
+            body: JSON.stringify({ landmarks, session: SESSION_ID, seq: ++predictSeq })
         });
         if (!res.ok) return;
         const data = await res.json();
@@ -2,12 +2,8 @@ import cv2
 import mediapipe as mp
 import csv
 import time
-import os
-import json
 
-DATASET_DIR = "datasets"
-CSV_FILE = os.path.join(DATASET_DIR, "gesture_landmarks.csv")
-CONFIG_FILE = os.path.join(DATASET_DIR, "gesture_config.json")
+from dataset_utils import CSV_FILE, ensure_csv, update_config
 
 CAPTURE_INTERVAL = 0.08
 
@@ -19,26 +15,7 @@ SAMPLE_OPTIONS = {
 }
 
 def initialize():
-    if not os.path.exists(DATASET_DIR):
-        os.makedirs(DATASET_DIR)
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, "w", newline="") as f:
-            writer = csv.writer(f)
-            header = ["label"]
-            for i in range(21):
-                header += [f"x{i}", f"y{i}", f"z{i}"]
-            writer.writerow(header)
-
-def update_config(gesture):
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            config = json.load(f)
-    else:
-        config = {"gestures": []}
-    if gesture not in config["gestures"]:
-        config["gestures"].append(gesture)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
+    ensure_csv(CSV_FILE)
 
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(